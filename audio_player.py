@@ -1,176 +1,392 @@
 #!/usr/bin/env python3
+import asyncio
+import concurrent.futures
+import functools
 import mpd
+import queue
+import threading
 import time
-from pathlib import Path
-import os
+from contextlib import contextmanager
 from config import MPD_HOST, MPD_PORT, MPD_PASSWORD, VOLUME_DEFAULT
 from utils import logger, format_time
 
+CONN_POOL_MAX_SIZE = 2  # One socket for commands, one for the idle subscriber
+
+# How many upcoming tracks to warm into the cache during playback
+PREFETCH_TRACKS = 2
+
+def _mpd_cmd(fn):
+    """Retry a command once on a fresh connection if the socket went stale.
+
+    Only connection-level errors are caught; anything else is a real bug
+    and is left to propagate.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return fn(self, *args, **kwargs)
+        except (mpd.ConnectionError, BrokenPipeError, OSError) as e:
+            logger.warning(f"MPD connection lost during {fn.__name__}, reconnecting: {e}")
+            # Go through connect() rather than just retrying: it reseeds
+            # the status cache and restarts the idle subscriber, which
+            # also heals a player constructed before MPD was up
+            self.connected = False
+            if not self.connect():
+                return False
+            try:
+                return fn(self, *args, **kwargs)
+            except (mpd.ConnectionError, BrokenPipeError, OSError) as e:
+                logger.error(f"Error in {fn.__name__} after reconnect: {e}")
+                return False
+    return wrapper
+
+class MPDConnectionPool:
+    """Small pool of persistent connections to the MPD server."""
+
+    def __init__(self, host, port, password=None, max_size=CONN_POOL_MAX_SIZE):
+        self.host = host
+        self.port = port
+        self.password = password
+        self._pool = queue.Queue(maxsize=max_size)
+        # Slots are filled lazily; None means "connect on first acquire"
+        for _ in range(max_size):
+            self._pool.put(None)
+
+    def new_client(self):
+        """Create and connect a new MPD client."""
+        client = mpd.MPDClient()
+        client.timeout = 10
+        client.idletimeout = None
+        client.connect(self.host, self.port)
+        if self.password:
+            client.password(self.password)
+        return client
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a connected client from the pool."""
+        client = self._pool.get()
+        try:
+            if client is None:
+                client = self.new_client()
+            yield client
+        except (mpd.ConnectionError, BrokenPipeError, OSError):
+            # Drop the broken connection; a fresh one is made on the
+            # next acquire
+            self._discard(client)
+            client = None
+            raise
+        except Exception:
+            # Command-level errors (bad URI, protocol misuse) leave
+            # the socket healthy - keep the connection alive
+            raise
+        finally:
+            self._pool.put(client)
+
+    def _discard(self, client):
+        """Close a client, ignoring errors on an already-dead socket."""
+        if client is None:
+            return
+        try:
+            client.disconnect()
+        except Exception:
+            pass
+
+    def close(self):
+        """Disconnect every pooled client."""
+        # Drain fully before refilling: putting None back mid-drain
+        # would keep the queue non-empty and loop forever
+        drained = 0
+        while True:
+            try:
+                client = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(client)
+            drained += 1
+        for _ in range(drained):
+            self._pool.put(None)
+
 class AudioPlayer:
     def __init__(self, network_handler):
         self.network_handler = network_handler
-        self.client = mpd.MPDClient()
-        self.client.timeout = 10
-        self.client.idletimeout = None
+        self.pool = MPDConnectionPool(MPD_HOST, MPD_PORT, MPD_PASSWORD)
+        self._status_cache = {}
+        # When the cached snapshot was taken; lets get_status extrapolate
+        # elapsed between idle events instead of freezing it
+        self._status_stamp = None
+        self._status_lock = threading.Lock()
+        self._stop_idle = threading.Event()
+        self._idle_thread = None
+        # Playlist positions -> library-relative paths, for prefetching
+        self._playlist_paths = []
+        self._prefetching = set()
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix='prefetch')
+        # Single worker so async callers never run MPD commands
+        # concurrently from the event loop
+        self._exec = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='mpd')
         self.connected = False
         self.connect()
-    
+
     def connect(self):
-        """Connect to the MPD server."""
+        """Verify the MPD server is reachable and start the idle subscriber."""
         try:
-            self.client.connect(MPD_HOST, MPD_PORT)
-            if MPD_PASSWORD:
-                self.client.password(MPD_PASSWORD)
+            with self.pool.acquire() as client:
+                client.setvol(VOLUME_DEFAULT)
+                # Seed the status cache so get_status works before the
+                # first idle event arrives
+                snapshot = self._fetch_status(client)
+            with self._status_lock:
+                self._status_cache = snapshot
+                self._status_stamp = time.monotonic()
             self.connected = True
-            self.set_volume(VOLUME_DEFAULT)
+            self._start_idle_thread()
             logger.info(f"Connected to MPD server at {MPD_HOST}:{MPD_PORT}")
             return True
         except Exception as e:
             self.connected = False
             logger.error(f"Failed to connect to MPD server: {e}")
             return False
-    
-    def ensure_connected(self):
-        """Ensure connection to MPD server."""
-        if not self.connected:
-            return self.connect()
+
+    def _start_idle_thread(self):
+        """Start the background thread watching MPD for state changes."""
+        if self._idle_thread and self._idle_thread.is_alive():
+            return
+        self._idle_thread = threading.Thread(
+            target=self._idle_loop, daemon=True, name="mpd-idle"
+        )
+        self._idle_thread.start()
+
+    @staticmethod
+    def _fetch_status(client):
+        """Fetch status and current song in one batched round trip."""
+        client.command_list_ok_begin()
+        client.status()
+        client.currentsong()
+        status, song = client.command_list_end()
+        merged = dict(status)
+        merged.update(song or {})
+        return merged
+
+    def _idle_loop(self):
+        """Wait on MPD idle events and cache the latest player state."""
+        client = None
+        while not self._stop_idle.is_set():
+            try:
+                if client is None:
+                    client = self.pool.new_client()
+                subsystems = client.idle('player', 'mixer', 'options')
+                fresh = self._fetch_status(client)
+                with self._status_lock:
+                    self._status_cache = fresh
+                    self._status_stamp = time.monotonic()
+                if 'player' in subsystems:
+                    # Overlap the next tracks' SMB reads with playback so
+                    # track changes hit the cache
+                    self._prefetch_upcoming(fresh)
+            except Exception as e:
+                if self._stop_idle.is_set():
+                    break
+                logger.error(f"MPD idle subscriber error: {e}")
+                self.pool._discard(client)
+                client = None
+                self._stop_idle.wait(1)
+        self.pool._discard(client)
+
+    def _prefetch_upcoming(self, status, count=PREFETCH_TRACKS):
+        """Submit cache prefetches for the next tracks in the playlist."""
         try:
-            # Ping to check if connection is still active
-            self.client.ping()
-            return True
-        except Exception:
-            return self.connect()
-    
+            next_pos = int(status.get('nextsong', -1))
+        except (TypeError, ValueError):
+            return
+        if next_pos < 0:
+            return
+
+        for pos in range(next_pos, min(next_pos + count, len(self._playlist_paths))):
+            path = self._playlist_paths[pos]
+            with self._prefetch_lock:
+                if path in self._prefetching:
+                    continue
+                self._prefetching.add(path)
+            self._prefetch_pool.submit(self._prefetch_one, path)
+
+    def _prefetch_one(self, path):
+        """Warm the cache for a single track."""
+        try:
+            self.network_handler.get_file_path(path)
+        except Exception as e:
+            logger.warning(f"Error prefetching {path}: {e}")
+        finally:
+            with self._prefetch_lock:
+                self._prefetching.discard(path)
+
+    def _run(self, command):
+        """Run a command on a pooled connection."""
+        with self.pool.acquire() as client:
+            return command(client)
+
+    @_mpd_cmd
     def play_album(self, album):
         """Play an album."""
-        if not self.ensure_connected() or not album or not album['tracks']:
-            logger.error("Cannot play album: not connected to MPD or album is empty")
+        if not album or not album['tracks']:
+            logger.error("Cannot play album: album is empty")
             return False
-        
-        try:
+
+        tracks = album['tracks']
+
+        # Resolve (and cache) all track paths in parallel up front so
+        # the MPD batch below isn't stalled on per-file cache copies
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=4, thread_name_prefix='resolve') as resolver:
+            resolved = list(resolver.map(
+                self.network_handler.get_file_path,
+                [track['file_path'] for track in tracks]))
+
+        playlist_paths = []
+        uris = []
+        for track, file_path in zip(tracks, resolved):
+            if file_path:
+                uris.append(f"file://{file_path}")
+                playlist_paths.append(track['file_path'])
+            else:
+                logger.warning(f"Could not find file for track: {track['title']}")
+
+        def _load(client):
             # Clear current playlist
-            self.client.clear()
-            
-            # Add all tracks to playlist
-            for track in album['tracks']:
-                # Get the actual file path
-                file_path = self.network_handler.get_file_path(track['file_path'])
-                if file_path:
-                    self.client.add(f"file://{file_path}")
-                else:
-                    logger.warning(f"Could not find file for track: {track['title']}")
-            
-            # Start playback
-            self.client.play()
-            logger.info(f"Started playback of album: {album['title']} by {album['artist']}")
-            return True
-        except Exception as e:
-            logger.error(f"Error playing album: {e}")
-            return False
-    
+            client.clear()
+
+            # Pipeline every add plus play into a single round trip
+            client.command_list_ok_begin()
+            for uri in uris:
+                client.add(uri)
+            client.play()
+            client.command_list_end()
+
+        self._run(_load)
+        self._playlist_paths = playlist_paths
+        logger.info(f"Started playback of album: {album['title']} by {album['artist']}")
+        return True
+
+    @_mpd_cmd
     def play(self):
         """Start or resume playback."""
-        if not self.ensure_connected():
-            return False
-        
-        try:
-            self.client.play()
-            return True
-        except Exception as e:
-            logger.error(f"Error starting playback: {e}")
-            return False
-    
+        self._run(lambda client: client.play())
+        return True
+
+    @_mpd_cmd
     def pause(self):
         """Pause playback."""
-        if not self.ensure_connected():
-            return False
-        
-        try:
-            self.client.pause()
-            return True
-        except Exception as e:
-            logger.error(f"Error pausing playback: {e}")
-            return False
-    
+        self._run(lambda client: client.pause())
+        return True
+
+    @_mpd_cmd
     def stop(self):
         """Stop playback."""
-        if not self.ensure_connected():
-            return False
-        
-        try:
-            self.client.stop()
-            return True
-        except Exception as e:
-            logger.error(f"Error stopping playback: {e}")
-            return False
-    
+        self._run(lambda client: client.stop())
+        return True
+
+    @_mpd_cmd
     def next_track(self):
         """Skip to next track."""
-        if not self.ensure_connected():
-            return False
-        
-        try:
-            self.client.next()
-            return True
-        except Exception as e:
-            logger.error(f"Error skipping to next track: {e}")
-            return False
-    
+        self._run(lambda client: client.next())
+        return True
+
+    @_mpd_cmd
     def previous_track(self):
         """Go to previous track."""
-        if not self.ensure_connected():
-            return False
-        
-        try:
-            self.client.previous()
-            return True
-        except Exception as e:
-            logger.error(f"Error going to previous track: {e}")
-            return False
-    
+        self._run(lambda client: client.previous())
+        return True
+
+    @_mpd_cmd
     def set_volume(self, volume):
         """Set volume (0-100)."""
-        if not self.ensure_connected():
-            return False
-        
-        try:
-            # Ensure volume is within bounds
-            volume = max(0, min(100, int(volume)))
-            self.client.setvol(volume)
-            return True
-        except Exception as e:
-            logger.error(f"Error setting volume: {e}")
-            return False
-    
+        # Ensure volume is within bounds
+        volume = max(0, min(100, int(volume)))
+        self._run(lambda client: client.setvol(volume))
+        return True
+
+    @_mpd_cmd
     def get_status(self):
-        """Get current playback status."""
-        if not self.ensure_connected():
-            return None
-        
-        try:
-            status = self.client.status()
-            current_song = self.client.currentsong() if status.get('state') != 'stop' else {}
-            
-            return {
-                'state': status.get('state', 'stop'),
-                'volume': int(status.get('volume', '0')),
-                'elapsed': float(status.get('elapsed', '0')),
-                'duration': float(status.get('duration', '0')),
-                'title': current_song.get('title', 'Unknown'),
-                'artist': current_song.get('artist', 'Unknown'),
-                'album': current_song.get('album', 'Unknown')
-            }
-        except Exception as e:
-            logger.error(f"Error getting playback status: {e}")
-            return None
-    
+        """Get current playback status from the cached idle snapshot."""
+        with self._status_lock:
+            snapshot = dict(self._status_cache)
+            stamped_at = self._status_stamp
+
+        if not snapshot:
+            # Idle subscriber hasn't produced a snapshot yet; fall
+            # back to a direct (batched) query
+            snapshot = self._run(self._fetch_status)
+            stamped_at = time.monotonic()
+
+        elapsed = float(snapshot.get('elapsed', '0'))
+        duration = float(snapshot.get('duration', '0'))
+        if snapshot.get('state') == 'play' and stamped_at is not None:
+            # The player subsystem only fires on play/pause/seek/song
+            # change, so advance the cached position by the time since
+            # the snapshot was taken
+            elapsed += time.monotonic() - stamped_at
+            if duration:
+                elapsed = min(elapsed, duration)
+
+        playing = snapshot.get('state') != 'stop'
+        return {
+            'state': snapshot.get('state', 'stop'),
+            'volume': int(snapshot.get('volume', '0')),
+            'elapsed': elapsed,
+            'duration': duration,
+            'title': snapshot.get('title', 'Unknown') if playing else 'Unknown',
+            'artist': snapshot.get('artist', 'Unknown') if playing else 'Unknown',
+            'album': snapshot.get('album', 'Unknown') if playing else 'Unknown'
+        }
+
+    async def _in_executor(self, fn, *args):
+        """Run a blocking call on the dedicated MPD worker thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._exec, fn, *args)
+
+    async def a_play_album(self, album):
+        """Async wrapper for play_album."""
+        return await self._in_executor(self.play_album, album)
+
+    async def a_play(self):
+        """Async wrapper for play."""
+        return await self._in_executor(self.play)
+
+    async def a_pause(self):
+        """Async wrapper for pause."""
+        return await self._in_executor(self.pause)
+
+    async def a_stop(self):
+        """Async wrapper for stop."""
+        return await self._in_executor(self.stop)
+
+    async def a_next_track(self):
+        """Async wrapper for next_track."""
+        return await self._in_executor(self.next_track)
+
+    async def a_previous_track(self):
+        """Async wrapper for previous_track."""
+        return await self._in_executor(self.previous_track)
+
+    async def a_set_volume(self, volume):
+        """Async wrapper for set_volume."""
+        return await self._in_executor(self.set_volume, volume)
+
+    async def a_get_status(self):
+        """Async wrapper for get_status."""
+        return await self._in_executor(self.get_status)
+
     def disconnect(self):
         """Disconnect from MPD server."""
         try:
             if self.connected:
-                self.client.close()
-                self.client.disconnect()
+                self._stop_idle.set()
+                self._prefetch_pool.shutdown(wait=False)
+                self._exec.shutdown(wait=False)
+                self.pool.close()
                 self.connected = False
                 logger.info("Disconnected from MPD server")
         except Exception as e:
-            logger.error(f"Error disconnecting from MPD server: {e}")
\ No newline at end of file
+            logger.error(f"Error disconnecting from MPD server: {e}")
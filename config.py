@@ -7,6 +7,15 @@ AUTHORIZED_USERS = [                            # Telegram user IDs that can con
     # Add your Telegram user ID(s) here
 ]
 
+# Webhook settings - Telegram pushes updates instead of the bot polling.
+# Requires a publicly reachable HTTPS endpoint and the tornado-backed
+# python-telegram-bot[webhooks] extra (see requirements.txt); leave
+# USE_WEBHOOK False to keep long polling (the default, works behind NAT)
+USE_WEBHOOK = False
+WEBHOOK_LISTEN = "0.0.0.0"
+WEBHOOK_PORT = 8443
+WEBHOOK_URL = None  # Public base URL, e.g. "https://example.duckdns.org:8443"
+
 # Network settings
 MUSIC_SERVER_IP = "192.168.0.3"
 MUSIC_SERVER_SHARE = "music"  # SMB share name
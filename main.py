@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import asyncio
 import signal
+import socket
 import sys
 import time
 import os
@@ -59,10 +60,26 @@ class LosslessAudioPlayer:
             if result.returncode != 0:
                 logger.info("MPD service not running. Starting it...")
                 subprocess.run("systemctl start mpd", shell=True, check=True)
-                # Give MPD time to start
-                time.sleep(3)
+                # Wait until MPD accepts connections rather than a fixed sleep
+                self._wait_for_mpd()
         except Exception as e:
             logger.error(f"Error ensuring MPD is running: {e}")
+
+    def _wait_for_mpd(self, timeout=5.0):
+        """Probe the MPD socket with backoff until it accepts connections."""
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+        while time.monotonic() < deadline:
+            try:
+                sock = socket.create_connection(
+                    (config.MPD_HOST, config.MPD_PORT), timeout=0.2)
+                sock.close()
+                return True
+            except OSError:
+                time.sleep(delay)
+                delay = min(delay * 2, 0.2)
+        logger.warning(f"MPD did not accept connections within {timeout} seconds")
+        return False
     
     async def run(self):
         """Run the player."""
@@ -74,28 +91,32 @@ class LosslessAudioPlayer:
         await self.telegram_bot.start()
         
         try:
-            # Main loop - perform maintenance tasks
+            # Main loop - perform maintenance tasks. Both jobs walk the
+            # filesystem or shell out to mount, so run them in worker
+            # threads to keep the event loop responsive
             while self.running:
                 # Clean cache if enabled
                 if config.CACHE_ENABLED:
-                    clean_cache(config.CACHE_PATH, config.CACHE_MAX_SIZE_GB)
-                
+                    await asyncio.to_thread(
+                        clean_cache, config.CACHE_PATH, config.CACHE_MAX_SIZE_GB,
+                        self.network_handler.cache_index)
+
                 # Check network connection
-                self.network_handler.ensure_mounted()
+                await asyncio.to_thread(self.network_handler.ensure_mounted)
                 
                 # Sleep for a while before next check
                 await asyncio.sleep(300)  # 5 minutes
         except asyncio.CancelledError:
             logger.info("Main loop cancelled")
         finally:
-            self.cleanup()
-    
-    def cleanup(self):
+            await self.cleanup()
+
+    async def cleanup(self):
         """Clean up resources."""
         logger.info("Cleaning up resources...")
-        
+
         # Stop Telegram bot
-        self.telegram_bot.stop()
+        await self.telegram_bot.stop()
         
         # Disconnect from MPD
         self.audio_player.disconnect()
@@ -1,64 +1,192 @@
 #!/usr/bin/env python3
+import asyncio
+import concurrent.futures
+import itertools
 import os
 import sqlite3
+import threading
 import time
 from pathlib import Path
 from tinytag import TinyTag
 from config import DB_PATH, MOUNT_POINT
 from utils import logger
-from network_handler import NetworkHandler
+from network_handler import SUPPORTED_EXTS
 
-SUPPORTED_FORMATS = ['.flac', '.wav', '.alac', '.ape', '.aiff', '.dsd', '.dsf', '.dff', '.wv']
+# Dotted-extension view of the supported formats; membership tests are
+# O(1) hash lookups
+SUPPORTED_FORMATS = frozenset('.' + ext for ext in SUPPORTED_EXTS)
+
+# Cover-art candidates in preference order
+COVER_ART_NAMES = ('cover.jpg', 'folder.jpg', 'album.jpg', 'front.jpg', 'artwork.jpg')
+
+# Query results only change on rescan, so cached snapshots stay valid
+# for a long time
+CACHE_TTL_SECONDS = 300
+CACHE_MAX_ENTRIES = 256
+
+# Tag reads block on CIFS I/O, so the scan benefits from concurrency
+TAG_POOL_WORKERS = 8
 
 class MusicLibrary:
     def __init__(self, network_handler):
         self.db_path = DB_PATH
         self.network_handler = network_handler
+        self._result_cache = {}
+        self._cache_lock = threading.Lock()
+        self._refreshing = set()
+        # One lazily opened connection per thread, kept for the life of
+        # the process; writes are serialized by this lock (WAL lets
+        # readers proceed concurrently)
+        self._db_lock = threading.Lock()
+        self._tls = threading.local()
+        self._fts_enabled = False
+        # Worker pool for async callers so queries stay off the event loop
+        self._exec = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix='library')
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        except Exception as e:
+            logger.error(f"Error creating database directory: {e}")
         self.init_db()
+
+    def _conn(self):
+        """Return this thread's database connection, opening it lazily."""
+        conn = getattr(self._tls, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            conn.execute('PRAGMA mmap_size=268435456')
+            self._tls.conn = conn
+        return conn
+
+    def _cached(self, key, fetch):
+        """Return a cached query result, refreshing stale entries in the background."""
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._result_cache.get(key)
+            if entry:
+                value, fetched_at = entry
+                if now - fetched_at < CACHE_TTL_SECONDS:
+                    return value
+                # Stale: serve the old snapshot immediately and refresh
+                # it off the caller's thread
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(
+                        target=self._refresh, args=(key, fetch), daemon=True
+                    ).start()
+                return value
+        value = fetch()
+        self._store(key, value)
+        return value
+
+    def _refresh(self, key, fetch):
+        """Background refresh of a stale cache entry."""
+        try:
+            self._store(key, fetch())
+        except Exception as e:
+            logger.error(f"Error refreshing cached result {key}: {e}")
+        finally:
+            with self._cache_lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, value):
+        """Store a result, stamped after the query so TTL reflects data age."""
+        with self._cache_lock:
+            if len(self._result_cache) >= CACHE_MAX_ENTRIES:
+                oldest = min(self._result_cache, key=lambda k: self._result_cache[k][1])
+                del self._result_cache[oldest]
+            self._result_cache[key] = (value, time.monotonic())
+
+    def _invalidate_cache(self):
+        """Drop all cached query results (library contents changed)."""
+        with self._cache_lock:
+            self._result_cache.clear()
     
     def init_db(self):
         """Initialize the SQLite database for the music library."""
         try:
-            # Create database directory if it doesn't exist
-            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create tables if they don't exist
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS albums (
-                    id INTEGER PRIMARY KEY,
-                    title TEXT NOT NULL,
-                    artist TEXT,
-                    year TEXT,
-                    directory TEXT UNIQUE,
-                    cover_art TEXT,
-                    last_updated INTEGER
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS tracks (
-                    id INTEGER PRIMARY KEY,
-                    album_id INTEGER,
-                    title TEXT NOT NULL,
-                    artist TEXT,
-                    track_number INTEGER,
-                    disc_number INTEGER,
-                    duration REAL,
-                    file_path TEXT UNIQUE,
-                    FOREIGN KEY (album_id) REFERENCES albums (id)
-                )
-            ''')
-            
-            # Create indices for faster searches
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_album_title ON albums (title)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_album_artist ON albums (artist)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_track_title ON tracks (title)')
-            
-            conn.commit()
-            conn.close()
+            with self._db_lock:
+                conn = self._conn()
+                cursor = conn.cursor()
+
+                # Create tables if they don't exist
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS albums (
+                        id INTEGER PRIMARY KEY,
+                        title TEXT NOT NULL,
+                        artist TEXT,
+                        year TEXT,
+                        directory TEXT UNIQUE,
+                        cover_art TEXT,
+                        last_updated INTEGER
+                    )
+                ''')
+
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS tracks (
+                        id INTEGER PRIMARY KEY,
+                        album_id INTEGER,
+                        title TEXT NOT NULL,
+                        artist TEXT,
+                        track_number INTEGER,
+                        disc_number INTEGER,
+                        duration REAL,
+                        file_path TEXT UNIQUE,
+                        FOREIGN KEY (album_id) REFERENCES albums (id)
+                    )
+                ''')
+
+                # Track per-directory mtimes so rescans can skip albums
+                # that haven't changed (added after the initial schema)
+                try:
+                    cursor.execute('ALTER TABLE albums ADD COLUMN directory_mtime INTEGER')
+                except sqlite3.OperationalError:
+                    pass  # Column already exists
+
+                # Create indices for faster searches
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_album_title ON albums (title)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_album_artist ON albums (artist)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_track_title ON tracks (title)')
+
+                # Full-text index over album title/artist, kept in sync by
+                # triggers so searches can use MATCH instead of LIKE scans
+                try:
+                    cursor.execute('''
+                        CREATE VIRTUAL TABLE IF NOT EXISTS albums_fts USING fts5(
+                            title, artist,
+                            content='albums', content_rowid='id',
+                            tokenize='unicode61 remove_diacritics 2'
+                        )
+                    ''')
+                    cursor.execute('''
+                        CREATE TRIGGER IF NOT EXISTS albums_fts_ai AFTER INSERT ON albums BEGIN
+                            INSERT INTO albums_fts(rowid, title, artist)
+                            VALUES (new.id, new.title, new.artist);
+                        END
+                    ''')
+                    cursor.execute('''
+                        CREATE TRIGGER IF NOT EXISTS albums_fts_ad AFTER DELETE ON albums BEGIN
+                            INSERT INTO albums_fts(albums_fts, rowid, title, artist)
+                            VALUES ('delete', old.id, old.title, old.artist);
+                        END
+                    ''')
+                    cursor.execute('''
+                        CREATE TRIGGER IF NOT EXISTS albums_fts_au AFTER UPDATE ON albums BEGIN
+                            INSERT INTO albums_fts(albums_fts, rowid, title, artist)
+                            VALUES ('delete', old.id, old.title, old.artist);
+                            INSERT INTO albums_fts(rowid, title, artist)
+                            VALUES (new.id, new.title, new.artist);
+                        END
+                    ''')
+                    self._fts_enabled = True
+                except sqlite3.OperationalError as e:
+                    logger.warning(f"FTS5 unavailable, search will fall back to LIKE: {e}")
+
+                conn.commit()
             logger.info("Database initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing database: {e}")
@@ -66,223 +194,306 @@ class MusicLibrary:
     def scan_library(self):
         """Scan the music library and update the database."""
         logger.info("Starting music library scan...")
-        
+
         if not self.network_handler.ensure_mounted():
             logger.error("Cannot scan library: network share not mounted")
             return False
-        
+
+        # Local to this scan so two concurrent /scan calls can't pull
+        # each other's executor out from underneath
+        tag_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=TAG_POOL_WORKERS, thread_name_prefix='tag')
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Get all music directories
-            music_dirs = self.network_handler.list_directories()
-            albums_found = 0
-            tracks_found = 0
-            
-            for dir_name in music_dirs:
-                # Skip hidden directories
-                if dir_name.startswith('.'):
-                    continue
-                
-                # Check if this directory contains music files
-                music_files = []
-                for ext in SUPPORTED_FORMATS:
-                    music_files.extend(self.network_handler.list_files(dir_name, f".*\\{ext}$"))
-                
-                if not music_files:
-                    # Check if this is a parent directory containing album directories
-                    subdirs = self.network_handler.list_directories(dir_name)
-                    for subdir in subdirs:
-                        albums_found += self._process_album_directory(os.path.join(dir_name, subdir), cursor)
-                else:
-                    # This directory is an album
-                    albums_found += self._process_album_directory(dir_name, cursor)
-            
-            conn.commit()
-            conn.close()
+            with self._db_lock:
+                conn = self._conn()
+                cursor = conn.cursor()
+
+                # One transaction for the whole scan; fsync cost is paid
+                # once at commit instead of per row
+                cursor.execute('PRAGMA synchronous=OFF')
+                cursor.execute('BEGIN IMMEDIATE')
+
+                # Prefetch stored directory mtimes in one query so
+                # unchanged albums can be skipped without a per-album lookup
+                cursor.execute('SELECT directory, directory_mtime FROM albums')
+                known_mtimes = {row['directory']: row['directory_mtime']
+                                for row in cursor.fetchall()}
+
+                # Get all music directories
+                music_dirs = self.network_handler.list_directories()
+                albums_found = 0
+                tracks_found = 0
+
+                for dir_name in music_dirs:
+                    # Skip hidden directories
+                    if dir_name.startswith('.'):
+                        continue
+
+                    # One directory read tells us both whether this is an
+                    # album and what subdirectories it contains
+                    subdirs, files = self.network_handler.list_entries(dir_name)
+                    music_files = sorted(
+                        f for f in files
+                        if f.rpartition('.')[2].lower() in SUPPORTED_EXTS)
+
+                    if not music_files:
+                        # This is a parent directory containing album directories
+                        for subdir in subdirs:
+                            albums_found += self._process_album_directory(
+                                os.path.join(dir_name, subdir), cursor, tag_pool,
+                                known_mtimes=known_mtimes)
+                    else:
+                        # This directory is an album
+                        albums_found += self._process_album_directory(
+                            dir_name, cursor, tag_pool, files,
+                            known_mtimes=known_mtimes)
+
+                conn.commit()
+                cursor.execute('PRAGMA synchronous=NORMAL')
+
+                if self._fts_enabled:
+                    # Pick up any rows written before the triggers existed
+                    cursor.execute("INSERT INTO albums_fts(albums_fts) VALUES('rebuild')")
+                    conn.commit()
+            self._invalidate_cache()
             logger.info(f"Library scan complete: {albums_found} albums, {tracks_found} tracks")
             return True
         except Exception as e:
+            try:
+                with self._db_lock:
+                    conn = self._conn()
+                    conn.rollback()
+                    conn.execute('PRAGMA synchronous=NORMAL')
+            except Exception:
+                pass
             logger.error(f"Error scanning library: {e}")
             return False
-    
-    def _process_album_directory(self, album_dir, cursor):
+        finally:
+            tag_pool.shutdown(wait=False)
+
+    @staticmethod
+    def _read_tag(path):
+        """Read tags from a music file, returning None on failure."""
+        try:
+            return TinyTag.get(path)
+        except Exception as e:
+            logger.warning(f"Error reading tags from {path}: {e}")
+            return None
+
+    def _process_album_directory(self, album_dir, cursor, tag_pool,
+                                 file_names=None, known_mtimes=None):
         """Process an album directory and add/update it in the database."""
         try:
-            # Get all music files in this directory
-            music_files = []
-            for ext in SUPPORTED_FORMATS:
-                music_files.extend(self.network_handler.list_files(album_dir, f".*\\{ext}$"))
-            
+            # Skip albums whose directory hasn't changed since the last scan
+            try:
+                mtime = int(os.stat(os.path.join(MOUNT_POINT, album_dir)).st_mtime)
+            except OSError:
+                mtime = None
+            if (known_mtimes is not None and mtime is not None
+                    and known_mtimes.get(album_dir) == mtime):
+                return 0
+
+            # List the directory once (unless the caller already did); the
+            # same listing answers both the music-file and cover-art checks
+            if file_names is None:
+                _, file_names = self.network_handler.list_entries(album_dir)
+
+            music_files = sorted(
+                f for f in file_names
+                if f.rpartition('.')[2].lower() in SUPPORTED_EXTS)
+
             if not music_files:
                 return 0
-                
-            # Check for cover art
+
+            # Check for cover art in the listing - no extra stat round trips
             cover_art = None
-            for art_file in ['cover.jpg', 'folder.jpg', 'album.jpg', 'front.jpg', 'artwork.jpg']:
-                art_path = os.path.join(album_dir, art_file)
-                if os.path.exists(os.path.join(MOUNT_POINT, art_path)):
-                    cover_art = art_path
+            entries = {name.lower(): name for name in file_names}
+            for art_file in COVER_ART_NAMES:
+                if art_file in entries:
+                    cover_art = os.path.join(album_dir, entries[art_file])
                     break
-            
+
+            # Read tags for every file in parallel; each read blocks on
+            # network I/O so this overlaps the CIFS round trips
+            full_paths = [os.path.join(MOUNT_POINT, album_dir, f) for f in music_files]
+            tags = list(tag_pool.map(self._read_tag, full_paths))
+
             # Get album metadata from the first music file
-            first_file_path = os.path.join(MOUNT_POINT, album_dir, music_files[0])
-            try:
-                tag = TinyTag.get(first_file_path)
+            tag = tags[0]
+            if tag:
                 album_title = tag.album or os.path.basename(album_dir)
                 album_artist = tag.albumartist or tag.artist or "Unknown Artist"
                 album_year = tag.year or "Unknown Year"
-            except Exception as e:
-                logger.warning(f"Error reading tags from {first_file_path}: {e}")
+            else:
                 album_title = os.path.basename(album_dir)
                 album_artist = "Unknown Artist"
                 album_year = "Unknown Year"
-            
+
             # Insert or update album in database
             cursor.execute('''
-                INSERT OR REPLACE INTO albums (title, artist, year, directory, cover_art, last_updated)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (album_title, album_artist, album_year, album_dir, cover_art, int(time.time())))
+                INSERT OR REPLACE INTO albums (title, artist, year, directory, cover_art, last_updated, directory_mtime)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (album_title, album_artist, album_year, album_dir, cover_art, int(time.time()), mtime))
             
             album_id = cursor.lastrowid
             
-            # Process tracks
-            for file_name in music_files:
+            # Process tracks, collecting rows for a single batched insert
+            track_rows = []
+            for file_name, tag in zip(music_files, tags):
                 file_path = os.path.join(album_dir, file_name)
-                full_path = os.path.join(MOUNT_POINT, file_path)
-                
-                try:
-                    tag = TinyTag.get(full_path)
+
+                if tag:
                     track_title = tag.title or os.path.splitext(file_name)[0]
                     track_artist = tag.artist or album_artist
                     track_number = tag.track or 0
                     disc_number = tag.disc or 1
                     duration = tag.duration or 0
-                except Exception as e:
-                    logger.warning(f"Error reading tags from {full_path}: {e}")
+                else:
                     track_title = os.path.splitext(file_name)[0]
                     track_artist = album_artist
                     track_number = 0
                     disc_number = 1
                     duration = 0
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO tracks (album_id, title, artist, track_number, disc_number, duration, file_path)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (album_id, track_title, track_artist, track_number, disc_number, duration, file_path))
-            
+
+                track_rows.append((album_id, track_title, track_artist,
+                                   track_number, disc_number, duration, file_path))
+
+            cursor.executemany('''
+                INSERT OR REPLACE INTO tracks (album_id, title, artist, track_number, disc_number, duration, file_path)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', track_rows)
+
             return 1
         except Exception as e:
             logger.error(f"Error processing album directory {album_dir}: {e}")
             return 0
     
+    async def _in_executor(self, fn, *args):
+        """Run a blocking call on the library worker pool."""
+        return await asyncio.get_running_loop().run_in_executor(self._exec, fn, *args)
+
+    async def a_search_albums(self, query):
+        """Async wrapper for search_albums."""
+        return await self._in_executor(self.search_albums, query)
+
+    async def a_get_album_by_id(self, album_id):
+        """Async wrapper for get_album_by_id."""
+        return await self._in_executor(self.get_album_by_id, album_id)
+
     def search_albums(self, query):
         """Search for albums matching the query."""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Search in album title and artist
-            cursor.execute('''
-                SELECT id, title, artist, year, directory, cover_art 
-                FROM albums 
+        return self._cached(('search', query), lambda: self._search_albums(query))
+
+    def _search_albums(self, query):
+        """Run the album search query against the database."""
+        fts_sql = '''
+            SELECT a.id AS album_id, a.title AS album_title,
+                   a.artist AS album_artist, a.year, a.directory, a.cover_art,
+                   t.title AS track_title, t.artist AS track_artist,
+                   t.track_number, t.disc_number, t.duration, t.file_path
+            FROM albums a
+            LEFT JOIN tracks t ON t.album_id = a.id
+            WHERE a.id IN (
+                SELECT rowid FROM albums_fts
+                WHERE albums_fts MATCH ?
+                ORDER BY rank
+                LIMIT 10
+            )
+            ORDER BY a.title, a.id, t.disc_number, t.track_number, t.title
+        '''
+        like_sql = '''
+            SELECT a.id AS album_id, a.title AS album_title,
+                   a.artist AS album_artist, a.year, a.directory, a.cover_art,
+                   t.title AS track_title, t.artist AS track_artist,
+                   t.track_number, t.disc_number, t.duration, t.file_path
+            FROM albums a
+            LEFT JOIN tracks t ON t.album_id = a.id
+            WHERE a.id IN (
+                SELECT id FROM albums
                 WHERE title LIKE ? OR artist LIKE ?
                 ORDER BY title
                 LIMIT 10
-            ''', (f"%{query}%", f"%{query}%"))
-            
-            albums = []
-            for row in cursor.fetchall():
-                album_id, title, artist, year, directory, cover_art = row
-                
-                # Get tracks for this album
-                cursor.execute('''
-                    SELECT title, artist, track_number, disc_number, duration, file_path
-                    FROM tracks
-                    WHERE album_id = ?
-                    ORDER BY disc_number, track_number, title
-                ''', (album_id,))
-                
-                tracks = []
-                for track_row in cursor.fetchall():
-                    track_title, track_artist, track_number, disc_number, duration, file_path = track_row
-                    tracks.append({
-                        'title': track_title,
-                        'artist': track_artist,
-                        'track_number': track_number,
-                        'disc_number': disc_number,
-                        'duration': duration,
-                        'file_path': file_path
-                    })
-                
-                albums.append({
-                    'id': album_id,
-                    'title': title,
-                    'artist': artist,
-                    'year': year,
-                    'directory': directory,
-                    'cover_art': cover_art,
-                    'tracks': tracks
-                })
-            
-            conn.close()
-            return albums
+            )
+            ORDER BY a.title, a.id, t.disc_number, t.track_number, t.title
+        '''
+        try:
+            # Fetch matching albums and their tracks in a single query,
+            # preferring the full-text index when available
+            match_expr = self._fts_match_expr(query) if self._fts_enabled else None
+            cursor = self._conn().cursor()
+            if match_expr:
+                try:
+                    cursor.execute(fts_sql, (match_expr,))
+                except sqlite3.OperationalError:
+                    # Query didn't parse as an FTS expression
+                    cursor.execute(like_sql, (f"%{query}%", f"%{query}%"))
+            else:
+                cursor.execute(like_sql, (f"%{query}%", f"%{query}%"))
+            rows = cursor.fetchall()
+
+            return [self._album_from_rows(album_rows)
+                    for _, album_rows in itertools.groupby(rows, key=lambda r: r['album_id'])]
         except Exception as e:
             logger.error(f"Error searching albums: {e}")
             return []
+
+    @staticmethod
+    def _fts_match_expr(query):
+        """Convert a free-text query into an FTS5 prefix-match expression."""
+        tokens = [t.replace('"', '""') for t in query.split()]
+        if not tokens:
+            return None
+        return ' '.join(f'"{t}"*' for t in tokens)
+
+    @staticmethod
+    def _album_from_rows(album_rows):
+        """Assemble an album dict from joined album+track rows."""
+        album_rows = list(album_rows)
+        first = album_rows[0]
+        return {
+            'id': first['album_id'],
+            'title': first['album_title'],
+            'artist': first['album_artist'],
+            'year': first['year'],
+            'directory': first['directory'],
+            'cover_art': first['cover_art'],
+            'tracks': [
+                {
+                    'title': row['track_title'],
+                    'artist': row['track_artist'],
+                    'track_number': row['track_number'],
+                    'disc_number': row['disc_number'],
+                    'duration': row['duration'],
+                    'file_path': row['file_path']
+                }
+                for row in album_rows if row['file_path'] is not None
+            ]
+        }
     
     def get_album_by_id(self, album_id):
         """Get album details by ID."""
+        return self._cached(('album', album_id), lambda: self._get_album_by_id(album_id))
+
+    def _get_album_by_id(self, album_id):
+        """Fetch album details from the database."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
+            cursor = self._conn().cursor()
             cursor.execute('''
-                SELECT id, title, artist, year, directory, cover_art 
-                FROM albums 
-                WHERE id = ?
+                SELECT a.id AS album_id, a.title AS album_title,
+                       a.artist AS album_artist, a.year, a.directory, a.cover_art,
+                       t.title AS track_title, t.artist AS track_artist,
+                       t.track_number, t.disc_number, t.duration, t.file_path
+                FROM albums a
+                LEFT JOIN tracks t ON t.album_id = a.id
+                WHERE a.id = ?
+                ORDER BY t.disc_number, t.track_number, t.title
             ''', (album_id,))
-            
-            row = cursor.fetchone()
-            if not row:
-                conn.close()
+            rows = cursor.fetchall()
+
+            if not rows:
                 return None
-                
-            album_id, title, artist, year, directory, cover_art = row
-            
-            # Get tracks for this album
-            cursor.execute('''
-                SELECT title, artist, track_number, disc_number, duration, file_path
-                FROM tracks
-                WHERE album_id = ?
-                ORDER BY disc_number, track_number, title
-            ''', (album_id,))
-            
-            tracks = []
-            for track_row in cursor.fetchall():
-                track_title, track_artist, track_number, disc_number, duration, file_path = track_row
-                tracks.append({
-                    'title': track_title,
-                    'artist': track_artist,
-                    'track_number': track_number,
-                    'disc_number': disc_number,
-                    'duration': duration,
-                    'file_path': file_path
-                })
-            
-            album = {
-                'id': album_id,
-                'title': title,
-                'artist': artist,
-                'year': year,
-                'directory': directory,
-                'cover_art': cover_art,
-                'tracks': tracks
-            }
-            
-            conn.close()
-            return album
+
+            return self._album_from_rows(rows)
         except Exception as e:
             logger.error(f"Error getting album {album_id}: {e}")
             return None
\ No newline at end of file
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
+import functools
 import os
+import pwd
 import re
 from pathlib import Path
 import subprocess
@@ -8,9 +10,21 @@ import shutil
 from config import (MUSIC_SERVER_IP, MUSIC_SERVER_SHARE, 
                    MUSIC_SERVER_USERNAME, MUSIC_SERVER_PASSWORD,
                    MOUNT_POINT, CACHE_PATH, CACHE_ENABLED)
-from utils import logger, execute_command
+from utils import logger, execute_command, CacheIndex
+
+# Lossless formats the library supports, as bare lowercase extensions
+SUPPORTED_EXTS = frozenset(
+    ('flac', 'wav', 'alac', 'ape', 'aiff', 'dsd', 'dsf', 'dff', 'wv'))
+
+@functools.lru_cache(maxsize=32)
+def _compile_filter(pattern):
+    """Compile (and memoize) a case-insensitive filename filter."""
+    return re.compile(pattern, re.IGNORECASE)
 
 class NetworkHandler:
+    # How long a mount-status check stays valid before re-reading mountinfo
+    MOUNT_CHECK_TTL = 5.0
+
     def __init__(self):
         self.mount_point = Path(MOUNT_POINT)
         self.cache_path = Path(CACHE_PATH)
@@ -18,11 +32,18 @@ class NetworkHandler:
         self.share = MUSIC_SERVER_SHARE
         self.username = MUSIC_SERVER_USERNAME
         self.password = MUSIC_SERVER_PASSWORD
+        self._mounted_cache = None
+        self._mounted_checked_at = 0.0
         
         # Create mount point and cache directory if they don't exist
         os.makedirs(self.mount_point, exist_ok=True)
+        self.cache_index = None
         if CACHE_ENABLED:
             os.makedirs(self.cache_path, exist_ok=True)
+            try:
+                self.cache_index = CacheIndex(self.cache_path)
+            except Exception as e:
+                logger.error(f"Error opening cache index: {e}")
         
         # Try to mount the network share
         self.ensure_mounted()
@@ -35,13 +56,28 @@ class NetworkHandler:
     
     def is_mounted(self):
         """Check if the network share is currently mounted."""
+        now = time.monotonic()
+        if (self._mounted_cache is not None
+                and now - self._mounted_checked_at < self.MOUNT_CHECK_TTL):
+            return self._mounted_cache
+
+        # Read the kernel's mount table directly instead of forking
+        # a shell for mount | grep; field 4 is the mount point
+        target = str(self.mount_point.resolve())
         try:
-            result = execute_command("mount | grep -q " + str(self.mount_point))
-            # If grep finds the mount point, the command succeeds
-            return result is not None
-        except Exception as e:
+            with open('/proc/self/mountinfo') as f:
+                mounted = any(line.split()[4] == target for line in f)
+        except OSError as e:
             logger.error(f"Error checking mount status: {e}")
-            return False
+            mounted = False
+
+        self._mounted_cache = mounted
+        self._mounted_checked_at = now
+        return mounted
+
+    def _invalidate_mount_cache(self):
+        """Force the next is_mounted call to re-read mountinfo."""
+        self._mounted_cache = None
     
     def mount_share(self):
         """Mount the network share."""
@@ -54,12 +90,17 @@ class NetworkHandler:
                 creds = f"username={self.username},password={self.password}"
             else:
                 creds = "guest"
-                
-            cmd = (f"mount -t cifs //{self.server_ip}/{self.share} {self.mount_point} "
-                   f"-o {creds},vers=3.0,uid=$(id -u pi),gid=$(id -g pi)")
-            
+
+            # Resolve the pi user's uid/gid here instead of via a
+            # shell's $(id ...) substitution
+            pi = pwd.getpwnam("pi")
+            cmd = ["mount", "-t", "cifs",
+                   f"//{self.server_ip}/{self.share}", str(self.mount_point),
+                   "-o", f"{creds},vers=3.0,uid={pi.pw_uid},gid={pi.pw_gid}"]
+
             result = execute_command(cmd)
-            
+            self._invalidate_mount_cache()
+
             if self.is_mounted():
                 logger.info(f"Successfully mounted share from {self.server_ip}")
                 return True
@@ -75,7 +116,8 @@ class NetworkHandler:
         """Unmount the network share if it's mounted."""
         try:
             if self.is_mounted():
-                result = execute_command(f"umount {self.mount_point}")
+                result = execute_command(["umount", str(self.mount_point)])
+                self._invalidate_mount_cache()
                 logger.info(f"Unmounted share from {self.server_ip}")
                 return True
             return True
@@ -107,7 +149,7 @@ class NetworkHandler:
                     if os.path.isfile(os.path.join(full_path, f))]
             
             if filter_pattern:
-                pattern = re.compile(filter_pattern, re.IGNORECASE)
+                pattern = _compile_filter(filter_pattern)
                 files = [f for f in files if pattern.search(f)]
                 
             return files
@@ -115,12 +157,77 @@ class NetworkHandler:
             logger.error(f"Error listing files at {path}: {e}")
             return []
     
+    @staticmethod
+    def _copy_to_cache(src_path, dst_path):
+        """Copy a file into the cache, using kernel-space copies when possible."""
+        with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            # Pre-allocate the destination to avoid fragmenting the SD card
+            size = os.fstat(src.fileno()).st_size
+            if size:
+                try:
+                    os.posix_fallocate(dst.fileno(), 0, size)
+                except OSError:
+                    pass
+
+            try:
+                # copy_file_range stays in the kernel, so a multi-hundred-MB
+                # FLAC never transits userspace buffers
+                while os.copy_file_range(src.fileno(), dst.fileno(), 1 << 30):
+                    pass
+            except OSError:
+                # Not supported across these filesystems; fall back to a
+                # large-buffer userspace copy
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+                shutil.copyfileobj(src, dst, length=1 << 20)
+
+        # Preserve timestamps like shutil.copy2 did
+        shutil.copystat(src_path, dst_path)
+
+    def list_music_files(self, path=""):
+        """List supported music files at the given path in one directory read."""
+        if not self.ensure_mounted():
+            return []
+
+        try:
+            full_path = self.mount_point / path if path else self.mount_point
+            with os.scandir(full_path) as entries:
+                return sorted(
+                    e.name for e in entries
+                    if e.is_file(follow_symlinks=False)
+                    and e.name.rpartition('.')[2].lower() in SUPPORTED_EXTS)
+        except Exception as e:
+            logger.error(f"Error listing music files at {path}: {e}")
+            return []
+
+    def list_entries(self, path=""):
+        """List subdirectory and file names at the given path in one pass."""
+        if not self.ensure_mounted():
+            return [], []
+
+        try:
+            full_path = self.mount_point / path if path else self.mount_point
+            dirs, files = [], []
+            with os.scandir(full_path) as entries:
+                for e in entries:
+                    if e.is_dir(follow_symlinks=False):
+                        dirs.append(e.name)
+                    elif e.is_file(follow_symlinks=False):
+                        files.append(e.name)
+            return dirs, files
+        except Exception as e:
+            logger.error(f"Error listing entries at {path}: {e}")
+            return [], []
+
     def get_file_path(self, relative_path):
         """Get the full path to a file."""
         if CACHE_ENABLED:
             # Check if file is in cache
             cache_file = self.cache_path / relative_path
             if os.path.exists(cache_file):
+                if self.cache_index:
+                    self.cache_index.record_hit(cache_file)
                 return str(cache_file)
             
             # Ensure the file exists on the network share
@@ -134,7 +241,9 @@ class NetworkHandler:
             # Copy to cache
             try:
                 os.makedirs(os.path.dirname(cache_file), exist_ok=True)
-                shutil.copy2(network_file, cache_file)
+                self._copy_to_cache(network_file, cache_file)
+                if self.cache_index:
+                    self.cache_index.record_add(cache_file)
                 return str(cache_file)
             except Exception as e:
                 logger.error(f"Error caching file {relative_path}: {e}")
@@ -1,18 +1,85 @@
 #!/usr/bin/env python3
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler
-from telegram.ext import ContextTypes, filters
+from telegram.ext import ApplicationHandlerStop, ContextTypes, TypeHandler, filters
 import asyncio
+import functools
 import re
-from config import TELEGRAM_BOT_TOKEN, AUTHORIZED_USERS
+import secrets
+from collections import defaultdict
+from config import (TELEGRAM_BOT_TOKEN, AUTHORIZED_USERS,
+                    USE_WEBHOOK, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_URL)
 from utils import logger, format_time, format_album_info
 
+# Only update types the bot actually handles; Telegram filters out the
+# rest server-side (edited messages, channel posts, chat members, ...)
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+# Frozen once at import so the per-update membership test is a hash
+# lookup; None means no whitelist configured (allow everyone)
+_AUTHORIZED = frozenset(AUTHORIZED_USERS) if AUTHORIZED_USERS else None
+
+# Built once; only the greeting name varies per /start call
+_START_TEMPLATE = (
+    "Hello, {name}! I'm your Raspberry Pi Lossless Audio Player bot.\n\n"
+    "You can control me by sending these commands:\n\n"
+    "/help - Show this help message\n"
+    "/play - Resume playback\n"
+    "/pause - Pause playback\n"
+    "/stop - Stop playback\n"
+    "/next - Skip to next track\n"
+    "/prev - Go to previous track\n"
+    "/volume [level] - Set volume (0-100)\n"
+    "/status - Show current playback status\n"
+    "/scan - Scan music library (may take time)\n\n"
+    "Or simply send me an album name to search for it!"
+)
+
+# Compiled once; collapses runs of whitespace in search queries
+_WS_RE = re.compile(r"\s+")
+
+_STATE_EMOJI = {
+    "play": "▶️",
+    "pause": "⏸",
+    "stop": "⏹"
+}
+
+def authorized(fn):
+    """Drop unauthorized updates and cap each user at one in-flight command.
+
+    The auth check is belt-and-braces on top of the group -1 guard
+    handler: a handler wired up without going through that guard still
+    can't be driven by strangers. The per-user semaphore stops a bursty
+    client stacking MPD round trips and Telegram replies, which is what
+    turns a flood of /status taps into RetryAfter storms.
+    """
+    @functools.wraps(fn)
+    async def wrapper(self, update, context):
+        user_id = update.effective_user.id
+        if not self._is_authorized(user_id):
+            return
+        locks = self._user_locks
+        async with locks[user_id]:
+            result = await fn(self, update, context)
+        # Without a whitelist the lock table can grow one entry per
+        # visitor; shed idle locks once it gets large
+        if _AUTHORIZED is None and len(locks) > 256:
+            for uid in [uid for uid, sem in locks.items() if not sem.locked()]:
+                del locks[uid]
+        return result
+    return wrapper
+
 class TelegramBot:
     def __init__(self, music_library, audio_player):
         self.music_library = music_library
         self.audio_player = audio_player
         self.bot = None
         self.current_album = None
+        # Formatted album Markdown keyed by album id; metadata only
+        # changes on /scan, which clears this
+        self._album_fmt_cache = {}
+        # One in-flight command per user; see the authorized decorator
+        self._user_locks = defaultdict(lambda: asyncio.Semaphore(1))
     
     async def start(self):
         """Start the Telegram bot."""
@@ -20,17 +87,26 @@ class TelegramBot:
             # Create the Application instance
             self.bot = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
             
-            # Add handlers
-            self.bot.add_handler(CommandHandler("start", self.cmd_start))
-            self.bot.add_handler(CommandHandler("help", self.cmd_help))
-            self.bot.add_handler(CommandHandler("play", self.cmd_play))
-            self.bot.add_handler(CommandHandler("pause", self.cmd_pause))
-            self.bot.add_handler(CommandHandler("stop", self.cmd_stop))
-            self.bot.add_handler(CommandHandler("next", self.cmd_next))
-            self.bot.add_handler(CommandHandler("prev", self.cmd_prev))
-            self.bot.add_handler(CommandHandler("volume", self.cmd_volume))
-            self.bot.add_handler(CommandHandler("status", self.cmd_status))
-            self.bot.add_handler(CommandHandler("scan", self.cmd_scan))
+            # Drop unauthorized updates before any command dispatch runs;
+            # spamming the bot from an unknown account costs us nothing
+            # but this one membership test
+            self.bot.add_handler(TypeHandler(Update, self._drop_unauthorized), group=-1)
+
+            # Add command handlers
+            commands = (
+                ("start", self.cmd_start),
+                ("help", self.cmd_help),
+                ("play", self.cmd_play),
+                ("pause", self.cmd_pause),
+                ("stop", self.cmd_stop),
+                ("next", self.cmd_next),
+                ("prev", self.cmd_prev),
+                ("volume", self.cmd_volume),
+                ("status", self.cmd_status),
+                ("scan", self.cmd_scan),
+            )
+            for name, handler in commands:
+                self.bot.add_handler(CommandHandler(name, handler))
             
             # Handle regular messages for album search
             self.bot.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
@@ -40,118 +116,102 @@ class TelegramBot:
             
             # Start the bot
             await self.bot.initialize()
-            await self.bot.start_polling()
-            logger.info("Telegram bot started successfully")
+            await self.bot.start()
+            if USE_WEBHOOK and WEBHOOK_URL:
+                # Telegram pushes updates to us over HTTPS - no idle
+                # getUpdates traffic. The secret path keeps strangers
+                # from posting fake updates to the endpoint
+                url_path = secrets.token_urlsafe(24)
+                await self.bot.updater.start_webhook(
+                    listen=WEBHOOK_LISTEN,
+                    port=WEBHOOK_PORT,
+                    url_path=url_path,
+                    webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{url_path}",
+                    allowed_updates=ALLOWED_UPDATES
+                )
+                logger.info("Telegram bot started successfully (webhook mode)")
+            else:
+                # Long-poll: Telegram holds the getUpdates request open for
+                # up to 30s, so an idle bot makes ~2 requests a minute
+                # instead of one every few seconds
+                await self.bot.updater.start_polling(
+                    timeout=30,
+                    poll_interval=0.0,
+                    bootstrap_retries=-1,
+                    allowed_updates=ALLOWED_UPDATES
+                )
+                logger.info("Telegram bot started successfully (polling mode)")
         except Exception as e:
             logger.error(f"Error starting Telegram bot: {e}")
     
-    def stop(self):
+    async def stop(self):
         """Stop the Telegram bot."""
         if self.bot:
-            asyncio.run(self.bot.stop())
+            if self.bot.updater.running:
+                await self.bot.updater.stop()
+            if self.bot.running:
+                await self.bot.stop()
+            await self.bot.shutdown()
             logger.info("Telegram bot stopped")
     
+    @authorized
     async def cmd_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle the /start command."""
-        user_id = update.effective_user.id
-        if not self._is_authorized(user_id):
-            await self._unauthorized_response(update)
-            return
-            
         await update.message.reply_text(
-            f"Hello, {update.effective_user.first_name}! I'm your Raspberry Pi Lossless Audio Player bot.\n\n"
-            "You can control me by sending these commands:\n\n"
-            "/help - Show this help message\n"
-            "/play - Resume playback\n"
-            "/pause - Pause playback\n"
-            "/stop - Stop playback\n"
-            "/next - Skip to next track\n"
-            "/prev - Go to previous track\n"
-            "/volume [level] - Set volume (0-100)\n"
-            "/status - Show current playback status\n"
-            "/scan - Scan music library (may take time)\n\n"
-            "Or simply send me an album name to search for it!"
-        )
+            _START_TEMPLATE.format(name=update.effective_user.first_name))
     
+    @authorized
     async def cmd_help(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle the /help command."""
-        user_id = update.effective_user.id
-        if not self._is_authorized(user_id):
-            await self._unauthorized_response(update)
-            return
-            
-        await self.cmd_start(update, context)
+        await update.message.reply_text(
+            _START_TEMPLATE.format(name=update.effective_user.first_name))
     
+    @authorized
     async def cmd_play(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle the /play command."""
-        user_id = update.effective_user.id
-        if not self._is_authorized(user_id):
-            await self._unauthorized_response(update)
-            return
-            
-        if self.audio_player.play():
+        if await self.audio_player.a_play():
             await update.message.reply_text("▶️ Playback resumed")
         else:
             await update.message.reply_text("❌ Failed to resume playback")
     
+    @authorized
     async def cmd_pause(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle the /pause command."""
-        user_id = update.effective_user.id
-        if not self._is_authorized(user_id):
-            await self._unauthorized_response(update)
-            return
-            
-        if self.audio_player.pause():
+        if await self.audio_player.a_pause():
             await update.message.reply_text("⏸ Playback paused")
         else:
             await update.message.reply_text("❌ Failed to pause playback")
     
+    @authorized
     async def cmd_stop(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle the /stop command."""
-        user_id = update.effective_user.id
-        if not self._is_authorized(user_id):
-            await self._unauthorized_response(update)
-            return
-            
-        if self.audio_player.stop():
+        if await self.audio_player.a_stop():
             await update.message.reply_text("⏹ Playback stopped")
         else:
             await update.message.reply_text("❌ Failed to stop playback")
     
+    @authorized
     async def cmd_next(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle the /next command."""
-        user_id = update.effective_user.id
-        if not self._is_authorized(user_id):
-            await self._unauthorized_response(update)
-            return
-            
-        if self.audio_player.next_track():
+        if await self.audio_player.a_next_track():
             await update.message.reply_text("⏭ Skipped to next track")
         else:
             await update.message.reply_text("❌ Failed to skip track")
     
+    @authorized
     async def cmd_prev(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle the /prev command."""
-        user_id = update.effective_user.id
-        if not self._is_authorized(user_id):
-            await self._unauthorized_response(update)
-            return
-            
-        if self.audio_player.previous_track():
+        if await self.audio_player.a_previous_track():
             await update.message.reply_text("⏮ Returned to previous track")
         else:
             await update.message.reply_text("❌ Failed to return to previous track")
     
+    @authorized
     async def cmd_volume(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle the /volume command."""
-        user_id = update.effective_user.id
-        if not self._is_authorized(user_id):
-            await self._unauthorized_response(update)
-            return
-            
         args = context.args
         if not args:
-            status = self.audio_player.get_status()
+            status = await self.audio_player.a_get_status()
             if status:
                 await update.message.reply_text(f"🔊 Current volume: {status['volume']}%")
             else:
@@ -164,74 +224,64 @@ class TelegramBot:
                 await update.message.reply_text("❌ Volume must be between 0 and 100")
                 return
                 
-            if self.audio_player.set_volume(volume):
+            if await self.audio_player.a_set_volume(volume):
                 await update.message.reply_text(f"🔊 Volume set to {volume}%")
             else:
                 await update.message.reply_text("❌ Failed to set volume")
         except ValueError:
             await update.message.reply_text("❌ Invalid volume level. Please provide a number between 0 and 100.")
     
+    @authorized
     async def cmd_status(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle the /status command."""
-        user_id = update.effective_user.id
-        if not self._is_authorized(user_id):
-            await self._unauthorized_response(update)
-            return
-            
-        status = self.audio_player.get_status()
+        status = await self.audio_player.a_get_status()
         if not status:
             await update.message.reply_text("❌ Failed to get playback status")
             return
             
-        state_emoji = {
-            "play": "▶️",
-            "pause": "⏸",
-            "stop": "⏹"
-        }.get(status['state'], "❓")
-        
-        message = f"{state_emoji} *Current Status*\n\n"
+        state_emoji = _STATE_EMOJI.get(status['state'], "❓")
+
         if status['state'] == 'stop':
-            message += "No playback in progress"
+            message = f"{state_emoji} *Current Status*\n\nNo playback in progress"
         else:
-            message += f"*Title:* {status['title']}\n"
-            message += f"*Artist:* {status['artist']}\n"
-            message += f"*Album:* {status['album']}\n"
-            message += f"*Position:* {format_time(status['elapsed'])}/{format_time(status['duration'])}\n"
-            message += f"*Volume:* {status['volume']}%"
-            
+            message = (
+                f"{state_emoji} *Current Status*\n\n"
+                f"*Title:* {status['title']}\n"
+                f"*Artist:* {status['artist']}\n"
+                f"*Album:* {status['album']}\n"
+                f"*Position:* {format_time(status['elapsed'])}/{format_time(status['duration'])}\n"
+                f"*Volume:* {status['volume']}%"
+            )
+
         await update.message.reply_text(message, parse_mode='Markdown')
     
+    @authorized
     async def cmd_scan(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle the /scan command."""
-        user_id = update.effective_user.id
-        if not self._is_authorized(user_id):
-            await self._unauthorized_response(update)
-            return
-            
         await update.message.reply_text("🔍 Scanning music library. This may take a while...")
-        
-        # Run scanning in a separate task
-        success = self.music_library.scan_library()
+
+        # Run the scan on a worker thread; it can take minutes and must
+        # not block the event loop
+        success = await asyncio.to_thread(self.music_library.scan_library)
         
         if success:
+            self._album_fmt_cache.clear()
             await update.message.reply_text("✅ Music library scan complete!")
         else:
             await update.message.reply_text("❌ Failed to scan music library")
     
+    @authorized
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle regular text messages as album searches."""
-        user_id = update.effective_user.id
-        if not self._is_authorized(user_id):
-            await self._unauthorized_response(update)
-            return
-            
-        query = update.message.text.strip()
+        # Normalize whitespace so " foo   bar " and "foo bar" hit the
+        # same library search-cache entry
+        query = _WS_RE.sub(" ", update.message.text).strip()
         if not query:
             return
             
         await update.message.reply_text(f"🔍 Searching for albums matching: *{query}*", parse_mode='Markdown')
         
-        albums = self.music_library.search_albums(query)
+        albums = await self.music_library.a_search_albums(query)
         
         if not albums:
             await update.message.reply_text("❌ No albums found matching your query")
@@ -245,24 +295,23 @@ class TelegramBot:
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             await update.message.reply_text(
-                format_album_info(album),
+                self._album_text(album),
                 reply_markup=reply_markup,
                 parse_mode='Markdown'
             )
         else:
             # If multiple albums found, show a list
-            message = "🎵 *Albums found:*\n\n"
-            keyboard = []
-            
-            for i, album in enumerate(albums):
-                # Add numbered list item
-                message += f"{i+1}. *{album['title']}* by {album['artist']}\n"
-                # Add button for this album
-                keyboard.append([InlineKeyboardButton(
+            message = "🎵 *Albums found:*\n\n" + "\n".join(
+                f"{i+1}. *{album['title']}* by {album['artist']}"
+                for i, album in enumerate(albums))
+            keyboard = [
+                [InlineKeyboardButton(
                     f"{i+1}. {album['title']} ({album['artist']})",
                     callback_data=f"album:{album['id']}"
-                )])
-            
+                )]
+                for i, album in enumerate(albums)
+            ]
+
             reply_markup = InlineKeyboardMarkup(keyboard)
             await update.message.reply_text(
                 message, 
@@ -270,47 +319,39 @@ class TelegramBot:
                 parse_mode='Markdown'
             )
     
+    @authorized
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle callback queries from inline keyboards."""
-        user_id = update.effective_user.id
-        if not self._is_authorized(user_id):
-            await update.callback_query.answer("Unauthorized")
-            return
-            
         query = update.callback_query
-        data = query.data
-        
-        if data.startswith("album:"):
+
+        # Callback data is "<action>:<album_id>"; parse it once
+        prefix, _, rest = query.data.partition(":")
+        if prefix not in ("album", "play"):
+            return
+        album_id = int(rest)
+
+        album = await self.music_library.a_get_album_by_id(album_id)
+        if not album:
+            await query.answer("Album not found")
+            return
+
+        if prefix == "album":
             # Show album details
-            album_id = int(data.split(":")[1])
-            album = self.music_library.get_album_by_id(album_id)
-            
-            if not album:
-                await query.answer("Album not found")
-                return
-                
             keyboard = [
                 [InlineKeyboardButton("▶️ Play Album", callback_data=f"play:{album_id}")],
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
-            
+
             await query.message.edit_text(
-                format_album_info(album),
+                self._album_text(album),
                 reply_markup=reply_markup,
                 parse_mode='Markdown'
             )
             await query.answer()
-            
-        elif data.startswith("play:"):
+
+        else:
             # Play the selected album
-            album_id = int(data.split(":")[1])
-            album = self.music_library.get_album_by_id(album_id)
-            
-            if not album:
-                await query.answer("Album not found")
-                return
-                
-            success = self.audio_player.play_album(album)
+            success = await self.audio_player.a_play_album(album)
             
             if success:
                 self.current_album = album
@@ -320,13 +361,24 @@ class TelegramBot:
                 await query.answer("Failed to play album")
                 await query.message.reply_text("❌ Failed to play album")
     
+    def _album_text(self, album):
+        """Format album info, reusing the cached string when possible."""
+        text = self._album_fmt_cache.get(album['id'])
+        if text is None:
+            text = format_album_info(album)
+            self._album_fmt_cache[album['id']] = text
+        return text
+
+    async def _drop_unauthorized(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Stop dispatch of unauthorized updates before any handler runs.
+
+        No reply is sent: answering strangers turns every spam message
+        into an outbound sendMessage call.
+        """
+        user = update.effective_user
+        if user is None or not self._is_authorized(user.id):
+            raise ApplicationHandlerStop
+
     def _is_authorized(self, user_id):
         """Check if user is authorized to use the bot."""
-        # If no authorized users specified, allow everyone
-        if not AUTHORIZED_USERS:
-            return True
-        return user_id in AUTHORIZED_USERS
-    
-    async def _unauthorized_response(self, update):
-        """Send unauthorized response."""
-        await update.message.reply_text("❌ You are not authorized to use this bot.")
\ No newline at end of file
+        return _AUTHORIZED is None or user_id in _AUTHORIZED
\ No newline at end of file
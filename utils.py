@@ -1,35 +1,68 @@
 #!/usr/bin/env python3
+import atexit
+import functools
 import logging
 import os
+import shlex
+import sqlite3
+import threading
 import time
 import shutil
 import subprocess
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from queue import SimpleQueue
+
+CACHE_INDEX_DB = "cache_index.db"
+
+# The format string uses none of these, so skip collecting them on
+# every log record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
 
 # Set up logging
 def setup_logging():
     log_dir = Path("/home/pi/pi_lossless_player/logs")
     log_dir.mkdir(exist_ok=True)
-    
+
+    # Log callers only enqueue the record; a listener thread does the
+    # actual writes, so SD-card latency never blocks the caller (or
+    # the asyncio loop the Telegram handlers run on)
+    log_queue = SimpleQueue()
+    listener = QueueListener(
+        log_queue,
+        # Rotate so a long-running player can't fill the SD card
+        RotatingFileHandler(log_dir / "player.log",
+                            maxBytes=10_000_000, backupCount=3),
+        logging.StreamHandler(),
+        respect_handler_level=True
+    )
+    listener.start()
+    # Flush queued records on interpreter exit; the listener thread is
+    # a daemon, so shutdown-path messages would otherwise be dropped
+    atexit.register(listener.stop)
+
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_dir / "player.log"),
-            logging.StreamHandler()
-        ]
+        handlers=[QueueHandler(log_queue)]
     )
     return logging.getLogger("pi_lossless_player")
 
 logger = setup_logging()
 
 def execute_command(command):
-    """Execute a shell command and return the output."""
-    logger.debug(f"Executing command: {command}")
+    """Execute a command and return the output.
+
+    Accepts an argv list/tuple or a plain string (tokenized with
+    shlex); either way the command runs without forking a shell.
+    """
+    # %-style args defer formatting until debug logging is actually on
+    logger.debug("Executing command: %s", command)
+    args = command if isinstance(command, (list, tuple)) else shlex.split(command)
     try:
-        result = subprocess.run(command, shell=True, check=True, 
-                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                               text=True)
+        result = subprocess.run(args, check=True, capture_output=True, text=True)
         return result.stdout.strip()
     except subprocess.CalledProcessError as e:
         logger.error(f"Command failed: {e.stderr}")
@@ -37,7 +70,13 @@ def execute_command(command):
 
 def format_time(seconds):
     """Format seconds to mm:ss format."""
-    minutes, seconds = divmod(int(seconds), 60)
+    # Truncate before the cache lookup so float positions like 12.3
+    # and 12.7 share the "00:12" entry
+    return _format_time(int(seconds))
+
+@functools.lru_cache(maxsize=4096)
+def _format_time(seconds):
+    minutes, seconds = divmod(seconds, 60)
     return f"{minutes:02d}:{seconds:02d}"
 
 def format_album_info(album_info):
@@ -52,37 +91,162 @@ def format_album_info(album_info):
     
     return formatted
 
-def clean_cache(cache_path, max_size_gb):
+def _iter_cache_files(root):
+    """Yield (path, size, atime) for every cache file via scandir.
+
+    DirEntry.stat() reuses the data from the directory read, so each
+    file costs one stat at most instead of the three a walk +
+    getsize + getatime combination pays.
+    """
+    try:
+        entries = os.scandir(root)
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_cache_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                if entry.name.startswith(CACHE_INDEX_DB):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, st.st_size, st.st_atime
+
+class CacheIndex:
+    """Sidecar index of cached files so eviction never re-stats the tree."""
+
+    def __init__(self, cache_path):
+        self.cache_path = str(cache_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.cache_path, CACHE_INDEX_DB),
+            check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                atime INTEGER
+            )
+        ''')
+        # A brand-new index alongside an existing cache means the index
+        # was lost; rebuild it from the filesystem once
+        if self.is_empty():
+            self.rebuild()
+
+    def record_hit(self, path):
+        """Refresh the access time of a cached file."""
+        with self._lock:
+            self._conn.execute('UPDATE cache_entries SET atime = ? WHERE path = ?',
+                               (time.time_ns(), str(path)))
+
+    def record_add(self, path):
+        """Record a newly cached file."""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO cache_entries (path, size, atime)
+                VALUES (?, ?, ?)
+            ''', (str(path), size, time.time_ns()))
+
+    def record_remove(self, path):
+        """Forget an evicted file."""
+        with self._lock:
+            self._conn.execute('DELETE FROM cache_entries WHERE path = ?',
+                               (str(path),))
+
+    def total_size(self):
+        """Total bytes of indexed cache files."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()
+        return row[0]
+
+    def entries_oldest_first(self):
+        """All (path, size) entries, least recently accessed first."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT path, size FROM cache_entries ORDER BY atime ASC').fetchall()
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT 1 FROM cache_entries LIMIT 1').fetchone() is None
+
+    def rebuild(self):
+        """Rebuild the index with one walk of the cache tree."""
+        rows = [(path, size, int(atime * 1e9))
+                for path, size, atime in _iter_cache_files(self.cache_path)]
+        with self._lock:
+            self._conn.execute('DELETE FROM cache_entries')
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO cache_entries (path, size, atime) VALUES (?, ?, ?)',
+                rows)
+
+def clean_cache(cache_path, max_size_gb, index=None):
     """Clean cache if it exceeds the maximum size."""
+    if index is not None:
+        _clean_cache_indexed(index, max_size_gb)
+        return
+    try:
+        max_bytes = max_size_gb * (1024**3)
+
+        # One scandir pass collects path, access time and size together
+        files = []
+        cache_size = 0
+        for file_path, size, atime in _iter_cache_files(cache_path):
+            files.append((file_path, atime, size))
+            cache_size += size
+
+        if cache_size <= max_bytes:
+            return
+
+        logger.info(f"Cache size ({cache_size / (1024**3):.2f} GB) exceeds limit, cleaning...")
+
+        # Sort by access time (oldest first)
+        files.sort(key=lambda x: x[1])
+
+        # Remove files until under limit, keeping a running byte count
+        # instead of re-walking the tree after every deletion
+        threshold_bytes = max_bytes * 0.8  # Keep 20% margin
+        running_bytes = cache_size
+        for file_path, _, size in files:
+            os.remove(file_path)
+            running_bytes -= size
+            if running_bytes < threshold_bytes:
+                break
+
+        logger.info(f"Cache cleaned, new size: {running_bytes / (1024**3):.2f} GB")
+    except Exception as e:
+        logger.error(f"Error cleaning cache: {e}")
+
+def _clean_cache_indexed(index, max_size_gb):
+    """Evict least-recently-used files using the cache index."""
     try:
-        cache_size = sum(os.path.getsize(os.path.join(dirpath, filename)) 
-                         for dirpath, _, filenames in os.walk(cache_path) 
-                         for filename in filenames)
-        
-        # Convert to GB
-        cache_size_gb = cache_size / (1024**3)
-        
-        if cache_size_gb > max_size_gb:
-            logger.info(f"Cache size ({cache_size_gb:.2f} GB) exceeds limit, cleaning...")
-            # Sort files by access time and remove oldest until under limit
-            files = []
-            for dirpath, _, filenames in os.walk(cache_path):
-                for filename in filenames:
-                    file_path = os.path.join(dirpath, filename)
-                    files.append((file_path, os.path.getatime(file_path)))
-            
-            # Sort by access time (oldest first)
-            files.sort(key=lambda x: x[1])
-            
-            # Remove files until under limit
-            for file_path, _ in files:
+        max_bytes = max_size_gb * (1024**3)
+        running_bytes = index.total_size()
+        if running_bytes <= max_bytes:
+            return
+
+        logger.info(f"Cache size ({running_bytes / (1024**3):.2f} GB) exceeds limit, cleaning...")
+        threshold_bytes = max_bytes * 0.8  # Keep 20% margin
+
+        for file_path, size in index.entries_oldest_first():
+            try:
                 os.remove(file_path)
-                new_size = sum(os.path.getsize(os.path.join(dirpath, f)) 
-                              for dirpath, _, fs in os.walk(cache_path) 
-                              for f in fs) / (1024**3)
-                if new_size < max_size_gb * 0.8:  # Keep 20% margin
-                    break
-                
-            logger.info(f"Cache cleaned, new size: {new_size:.2f} GB")
+            except OSError:
+                pass  # Already gone; just drop it from the index
+            index.record_remove(file_path)
+            running_bytes -= size
+            if running_bytes < threshold_bytes:
+                break
+
+        logger.info(f"Cache cleaned, new size: {running_bytes / (1024**3):.2f} GB")
     except Exception as e:
         logger.error(f"Error cleaning cache: {e}")
\ No newline at end of file